@@ -2,31 +2,68 @@
 
 from flask import Flask, render_template
 from flask_socketio import SocketIO
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+import logging
+import os
 import threading
-import time
-import subprocess
+from spellcheck_crawler import run_spellcheck_audit
+
+LOG_FILE = os.path.abspath('crawler.log')
+
+# The crawler's logging config now lives in this process; keep request logs
+# on the console so they don't land in (and get streamed from) crawler.log
+logging.getLogger('werkzeug').propagate = False
 
 app = Flask(__name__)
 socketio = SocketIO(app)
+audit_lock = threading.Lock()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/run', methods=['POST'])
+def run():
+    if not run_crawler():
+        return {'status': 'already running'}, 409
+    return {'status': 'started'}, 202
+
+# Woken by inotify (or the platform equivalent) only when the log is written,
+# instead of polling it twice a second
+class LogHandler(FileSystemEventHandler):
+    def __init__(self, path):
+        self.path = path
+        self.log_file = open(path, 'r')
+        self.log_file.seek(0, 2)  # Move to end of file
+
+    def on_modified(self, event):
+        if event.src_path != self.path:
+            return
+        for line in self.log_file:
+            socketio.emit('log_update', {'log': line})
+
 def stream_logs():
-    with open('crawler.log', 'r') as log_file:
-        log_file.seek(0, 2)  # Move to end of file
-        while True:
-            line = log_file.readline()
-            if line:
-                socketio.emit('log_update', {'log': line})
-            else:
-                time.sleep(0.5)
+    observer = Observer()
+    observer.schedule(LogHandler(LOG_FILE), os.path.dirname(LOG_FILE), recursive=False)
+    observer.start()
+    return observer
 
+# Runs the audit in-process, reusing the already imported crawler instead of
+# paying for a fresh interpreter and its imports on every run
 def run_crawler():
-    subprocess.call(['python', 'spellcheck_crawler.py'])
+    if not audit_lock.acquire(blocking=False):
+        return False
+
+    def audit():
+        try:
+            run_spellcheck_audit()
+        finally:
+            audit_lock.release()
+
+    socketio.start_background_task(audit)
+    return True
 
 if __name__ == '__main__':
-    threading.Thread(target=stream_logs, daemon=True).start()
-    threading.Thread(target=run_crawler, daemon=True).start()
+    stream_logs()
     socketio.run(app, debug=True, port=5000)
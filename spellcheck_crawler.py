@@ -1,144 +1,415 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import asyncio
+import httpx
+from lxml import etree
+from urllib.parse import urljoin, urlparse
 import re
-import pandas as pd
-import time
+import string
+from bisect import bisect_right
+from itertools import chain, compress
+import random
+import csv
+import functools
+import glob
+import os
+import socket
+import tempfile
+import marisa_trie
 import xml.etree.ElementTree as ET
-from concurrent.futures import ThreadPoolExecutor, as_completed, ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+import threading
 import logging
-from datetime import datetime
-import difflib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from rapidfuzz import process, fuzz
 import multiprocessing
 
 # Logging
 logging.basicConfig(filename='crawler.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
+# httpx logs every request at INFO; keep the crawl log to our own messages
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # Config
 BASE_URL = "https://auraadesign.co.uk"
 SITEMAP_URL = urljoin(BASE_URL, "/sitemap_index.xml")
 HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; SpellSentinelBot/1.0)"}
-MAX_DOWNLOAD_WORKERS = 30
+MAX_CONCURRENT_REQUESTS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_TIMEOUT = 60
+SITEMAP_CHUNK_SIZE = 64 * 1024
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
 MAX_PROCESS_WORKERS = multiprocessing.cpu_count()
 RETRY_LIMIT = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 8
+MAX_RETRY_AFTER = 60
 TIMEOUT = 15
-
-# Load word list once (shared between processes)
-try:
-    with open("en_GB.txt", "r", encoding="utf-8") as f:
-        british_words = set(word.strip().lower() for word in f if word.strip())
-    logging.info("Custom en_GB word list loaded.")
-except FileNotFoundError:
-    logging.error("British English word list 'en_GB.txt' not found. Exiting.")
-    raise SystemExit("❌ 'en_GB.txt' not found.")
+SUGGESTION_CACHE_SIZE = 65536
+SUGGESTION_CUTOFF = 80
+REPORT_FIELDS = ["URL", "Misspelled Word", "Suggested Correction (British English)", "Context"]
 
 CUSTOM_IGNORE = {"auraa", "auraadesign", "luxury", "wallart", "faux"}
-british_words.update(CUSTOM_IGNORE)
+# Common words and contractions that word lists often omit; merged into the
+# vocabulary so they are never flagged or sent for suggestions
+STOPWORDS = frozenset({
+    "the", "and", "for", "with", "that", "this", "from", "your", "you", "our",
+    "are", "was", "were", "not", "but", "have", "has", "had", "will", "can",
+    "all", "any", "its", "their", "they", "them", "there", "which", "what",
+    "it's", "don't", "doesn't", "didn't", "can't", "won't", "isn't", "aren't",
+    "wasn't", "we're", "we've", "we'll", "you're", "you've", "you'll", "i'm",
+    "i've", "i'll", "i'd", "that's", "there's", "let's", "who's", "what's",
+})
+
+# Tokenizers, compiled once rather than per page/sentence. Words of one or
+# two letters are never worth reporting, so the regex skips them outright
+# rather than allocating and lower-casing them first
+# Fixed-width guards keep common titles ("Mr. Smith") and initialisms
+# ("U.K. Delivery", "e.g. Oak") from ending a sentence
+_SENT_RE = re.compile(r'(?<!\bMr\.)(?<!\bMrs\.)(?<!\bMs\.)(?<!\bDr\.)(?<!\bSt\.)(?<!\bProf\.)'
+                      r'(?<!\b[A-Za-z]\.[A-Za-z]\.)(?<=[.?])\s+(?=[A-Z])')
+_WORD_RE = re.compile(r"\b[a-zA-Z']{3,}\b")
+# Lower-cases ASCII letters only, so offsets in the translated page line up
+# one-to-one with the original text
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
 
-# Shared session
-session = requests.Session()
-session.headers.update(HEADERS)
+# HTML text extraction in a single pass: comments and blank text are dropped
+# by the parser, and one compiled XPath collects the visible text nodes.
+# A parser is fixed to one encoding, so one is built per response charset
+# and reused; None leaves lxml to detect the encoding from the markup
+_TEXT_XPATH = etree.XPath(
+    "//text()[not(ancestor::script or ancestor::style or ancestor::noscript)]",
+    smart_strings=False)
 
-def extract_urls_from_sitemap(sitemap_url):
-    urls = []
+@functools.lru_cache(maxsize=32)
+def _html_parser(encoding=None):
+    try:
+        return etree.HTMLParser(encoding=encoding, remove_comments=True, remove_blank_text=True)
+    except LookupError:
+        return _html_parser(None)
+
+# Streams <loc> entries out of the sitemap as it downloads, so page checks
+# can start before a large index has been fully fetched or parsed
+async def extract_urls_from_sitemap(client, sitemap_url, _seen=None):
+    _seen = _seen if _seen is not None else set()
+    if sitemap_url in _seen:
+        return
+    _seen.add(sitemap_url)
+    children = []
     try:
-        resp = session.get(sitemap_url, timeout=TIMEOUT)
-        if resp.status_code != 200:
-            return urls
-        root = ET.fromstring(resp.content)
-        ns = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        for sitemap in root.findall("ns:sitemap", ns):
-            loc = sitemap.find("ns:loc", ns).text
-            urls.extend(extract_urls_from_sitemap(loc))
-        for url in root.findall("ns:url", ns):
-            loc = url.find("ns:loc", ns)
-            if loc is not None:
-                urls.append(loc.text)
+        async with client.stream("GET", sitemap_url) as resp:
+            if resp.status_code != 200:
+                return
+            parser = ET.XMLPullParser(events=("start", "end"))
+            root = None
+            async for chunk in resp.aiter_bytes(SITEMAP_CHUNK_SIZE):
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    if event == "start":
+                        if root is None:
+                            root = elem
+                        continue
+                    if elem.tag not in (SITEMAP_NS + "sitemap", SITEMAP_NS + "url"):
+                        continue
+                    # Only the entry's own <loc>, not e.g. a nested <image:loc>
+                    loc = elem.find(SITEMAP_NS + "loc")
+                    if loc is not None:
+                        if elem.tag == SITEMAP_NS + "sitemap":
+                            children.append(loc.text)
+                        else:
+                            yield loc.text
+                    root.clear()  # Drop finished entries to keep memory flat
+            parser.close()
     except Exception as e:
         logging.error(f"Sitemap parse error: {e}")
-    return urls
+    if children:
+        async for url in _merge_child_sitemaps(client, children, _seen):
+            yield url
+
+# Streams the child sitemaps of an index concurrently, yielding their URLs
+# through one queue in whatever order they arrive
+async def _merge_child_sitemaps(client, children, seen):
+    queue = asyncio.Queue()
+    finished = object()
+
+    async def drain(child):
+        try:
+            async for url in extract_urls_from_sitemap(client, child, seen):
+                await queue.put(url)
+        finally:
+            await queue.put(finished)
+
+    tasks = [asyncio.create_task(drain(child)) for child in children]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            url = await queue.get()
+            if url is finished:
+                remaining -= 1
+            else:
+                yield url
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# The charset from the Content-Type header wins, as it did with resp.text;
+# lxml only sniffs the markup when the header has none (or an unknown one)
+def parse_html(content, encoding=None):
+    if not content.strip():
+        return ""
+    root = etree.fromstring(content, _html_parser(encoding))
+    if root is None:
+        return ""
+    return ' '.join(s for s in (s.strip() for s in _TEXT_XPATH(root)) if s)
 
-def extract_text_from_url(url):
+def retry_delay(attempt, resp=None):
+    # A server's Retry-After (delay in seconds or an HTTP-date) wins over our
+    # own backoff; fetch_page gives up if it exceeds MAX_RETRY_AFTER
+    retry_after = resp.headers.get("Retry-After", "").strip() if resp is not None else ""
+    if retry_after.isdigit():
+        return int(retry_after)
+    if retry_after:
+        try:
+            return max((parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds(), 0)
+        except (TypeError, ValueError):
+            pass
+    # Exponential backoff with jitter so stalled requests don't retry in lockstep
+    return min(2 ** attempt, MAX_BACKOFF) + random.random()
+
+async def fetch_page(client, url):
     for attempt in range(RETRY_LIMIT):
+        resp = None
         try:
-            resp = session.get(url, timeout=TIMEOUT)
-            if resp.status_code != 200:
-                continue
-            soup = BeautifulSoup(resp.text, "lxml")
-            for tag in soup(["script", "style", "noscript"]):
-                tag.decompose()
-            text = ' '.join(soup.stripped_strings)
-            return url, text.strip()
+            resp = await client.get(url)
+            if resp.status_code == 200:
+                return resp.content, resp.charset_encoding
+            # Other 4xx responses won't change on retry
+            if resp.status_code not in RETRY_STATUSES:
+                break
+            logging.warning(f"Retry {attempt + 1} for {url}: HTTP {resp.status_code}")
         except Exception as e:
             logging.warning(f"Retry {attempt + 1} for {url}: {e}")
-            time.sleep(1)
-    return url, ""
+        if attempt + 1 < RETRY_LIMIT:
+            delay = retry_delay(attempt, resp)
+            if delay > MAX_RETRY_AFTER:
+                logging.warning(f"Giving up on {url}: server asked to retry after {delay:.0f}s")
+                break
+            await asyncio.sleep(delay)
+    return b"", None
+
+# Load word list once in the parent; it is compiled to MARISA trie files
+# that every worker maps through _init_worker
+def load_british_words():
+    try:
+        with open("en_GB.txt", "r", encoding="utf-8") as f:
+            british_words = set(word.strip().lower() for word in f if word.strip())
+        logging.info("Custom en_GB word list loaded.")
+    except FileNotFoundError:
+        logging.error("British English word list 'en_GB.txt' not found. Exiting.")
+        raise SystemExit("❌ 'en_GB.txt' not found.")
+    return frozenset(british_words | CUSTOM_IGNORE | STOPWORDS)
+
+# Suggestions from the most recent report, used to warm-start the workers.
+# Only entries still consistent with the current vocabulary are kept: words
+# that are now known are dropped, as are suggestions no longer in it
+def load_known_suggestions(vocab):
+    reports = sorted(glob.glob("auraa_spellcheck_report_*.csv"))
+    if not reports:
+        return {}
+    try:
+        with open(reports[-1], "r", newline="", encoding="utf-8") as f:
+            known = {}
+            for row in csv.DictReader(f):
+                word = row["Misspelled Word"].lower()
+                suggestion = row["Suggested Correction (British English)"]
+                if word not in vocab and (suggestion == "" or suggestion in vocab):
+                    known[word] = suggestion
+    except (OSError, KeyError, csv.Error) as e:
+        logging.warning(f"Could not read previous report {reports[-1]}: {e}")
+        return {}
+    logging.info(f"Loaded {len(known)} known suggestions from {reports[-1]}.")
+    return known
 
-# Edit-distance suggestion
+# The vocabulary is compiled to MARISA tries: one for membership tests and
+# one per word length, which suggest_word scans for candidates. Returns the
+# lengths that have a trie.
+def save_vocabulary(words, directory):
+    marisa_trie.Trie(words).save(os.path.join(directory, "vocab.marisa"))
+    by_length = {}
+    for word in words:
+        by_length.setdefault(len(word), []).append(word)
+    for length, group in by_length.items():
+        marisa_trie.Trie(group).save(os.path.join(directory, f"vocab_{length}.marisa"))
+    return sorted(by_length)
+
+# Process pool initializer: each worker memory-maps the compiled tries, so
+# all processes share one read-only copy of the vocabulary through the page
+# cache instead of each holding Python strings for every word
+_VOCAB = marisa_trie.Trie()
+_VOCAB_BY_LENGTH = {}
+_KNOWN_SUGGESTIONS = {}
+
+def _init_worker(vocab_dir, lengths, known_suggestions):
+    global _VOCAB, _VOCAB_BY_LENGTH, _KNOWN_SUGGESTIONS
+    _VOCAB = marisa_trie.Trie().mmap(os.path.join(vocab_dir, "vocab.marisa"))
+    _VOCAB_BY_LENGTH = {length: marisa_trie.Trie().mmap(os.path.join(vocab_dir, f"vocab_{length}.marisa"))
+                        for length in lengths}
+    _KNOWN_SUGGESTIONS = known_suggestions
+    suggest_word.cache_clear()
+
+# Edit-distance suggestion. The same misspellings recur across pages, so
+# results are memoised per worker process
+@functools.lru_cache(maxsize=SUGGESTION_CACHE_SIZE)
 def suggest_word(word):
-    matches = difflib.get_close_matches(word, british_words, n=1, cutoff=0.8)
-    return matches[0] if matches else ""
+    if word in _KNOWN_SUGGESTIONS:
+        return _KNOWN_SUGGESTIONS[word]
+    # fuzz.ratio is 200 * LCS / (len(a) + len(b)), so only words in this
+    # length range can reach the cutoff; they are streamed straight from the
+    # tries rather than kept as a list of every word
+    shortest = -(-len(word) * SUGGESTION_CUTOFF // (200 - SUGGESTION_CUTOFF))
+    longest = len(word) * (200 - SUGGESTION_CUTOFF) // SUGGESTION_CUTOFF
+    candidates = chain.from_iterable(_VOCAB_BY_LENGTH[length].iterkeys()
+                                     for length in range(shortest, longest + 1)
+                                     if length in _VOCAB_BY_LENGTH)
+    match = process.extractOne(word, candidates, scorer=fuzz.ratio, score_cutoff=SUGGESTION_CUTOFF)
+    return match[0] if match else ""
 
 def find_spelling_errors_for_text(data):
     url, text = data
     if not text or len(text) < 100:
         return []
 
-    sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?)\s', text)
+    # Lower-case and tokenise the whole page once, then look up each distinct
+    # token once; most pages have nothing left to report
+    lower_text = text.translate(_ASCII_LOWER)
+    tokens = _WORD_RE.findall(lower_text)
+    unknown = {w for w in set(tokens) if w not in _VOCAB}
+    if not unknown:
+        return []
+
+    # Sentence i spans bounds[i]:bounds[i + 1]
+    bounds = [0, *(m.end() for m in _SENT_RE.finditer(text)), len(text)]
+    sentences = {}
+    first_index = {}
     seen = set()
     results = []
 
-    for sentence in sentences:
-        words = re.findall(r"\b[a-zA-Z']+\b", sentence)
-        for word in words:
-            lw = word.lower()
-            if lw not in british_words and (lw, sentence) not in seen:
-                seen.add((lw, sentence))
-                suggestion = suggest_word(lw)
-                results.append({
-                    "URL": url,
-                    "Misspelled Word": word,
-                    "Suggested Correction (British English)": suggestion,
-                    "Context": sentence.strip()
-                })
+    # compress() picks out the matches of unknown tokens without running any
+    # Python code for the (vast majority of) correctly spelled ones
+    for m in compress(_WORD_RE.finditer(lower_text), map(unknown.__contains__, tokens)):
+        lw = m[0]
+        idx = bisect_right(bounds, m.start()) - 1
+        sentence = sentences.get(idx)
+        if sentence is None:
+            context = text[bounds[idx]:bounds[idx + 1]].strip()
+            # Repeated boilerplate sentences share the index of their first
+            # occurrence, so they are only reported once
+            sentence = sentences[idx] = (first_index.setdefault(context, idx), context)
+        sent_idx, context = sentence
+        if (lw, sent_idx) in seen:
+            continue
+        seen.add((lw, sent_idx))
+        results.append({
+            "URL": url,
+            "Misspelled Word": text[m.start():m.end()],
+            "Suggested Correction (British English)": suggest_word(lw),
+            "Context": context
+        })
 
     return results
 
-def run_spellcheck_audit():
-    urls = extract_urls_from_sitemap(SITEMAP_URL)
-    if not urls:
-        print("❌ No URLs found.")
-        return
+# Runs in the process pool: parse and spellcheck in one task so the page
+# text never has to be sent back to the event loop
+def audit_page(url, content, encoding):
+    return find_spelling_errors_for_text((url, parse_html(content, encoding)))
 
-    print(f"🔎 Total URLs found: {len(urls)}")
+# Looks up the site's host while the vocabulary is compiled so a caching
+# system resolver already has the answer; failures are only logged, and the
+# request itself retries as usual
+def resolve_host(url):
+    site = urlparse(url)
+    try:
+        socket.getaddrinfo(site.hostname, site.port or (443 if site.scheme == "https" else 80),
+                           type=socket.SOCK_STREAM)
+    except OSError as e:
+        logging.warning(f"DNS lookup failed for {site.hostname}: {e}")
+
+async def crawl_site(processor):
+    loop = asyncio.get_running_loop()
+    # One client for the whole crawl. The site is a single origin, so over
+    # HTTP/2 every request is multiplexed as a stream on the same one or two
+    # connections instead of paying a TCP/TLS handshake per socket
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS,
+                          max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                          keepalive_expiry=KEEPALIVE_TIMEOUT)
+    async with httpx.AsyncClient(http2=True, headers=HEADERS, timeout=TIMEOUT, limits=limits,
+                                 follow_redirects=True) as client:
+        # Each page is fetched, handed straight to the process pool and dropped
+        # once checked; the semaphore spans both stages so at most
+        # MAX_CONCURRENT_REQUESTS pages are held in memory at any time
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        completed = 0
+        urls = []
+        tasks = []
+
+        async def audit(url):
+            nonlocal completed
+            async with semaphore:
+                content, encoding = await fetch_page(client, url)
+                errors = await loop.run_in_executor(processor, audit_page, url, content, encoding)
+            completed += 1
+            print(f"[{completed}/{len(urls)}] Checked: {url}")
+            return errors
+
+        # Pages listed in several sitemaps are only downloaded once
+        seen_urls = set()
+        async for url in extract_urls_from_sitemap(client, SITEMAP_URL):
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+            urls.append(url)
+            tasks.append(asyncio.create_task(audit(url)))
+
+        if not urls:
+            print("❌ No URLs found.")
+            return None
+
+        print(f"🔎 Total URLs found: {len(urls)}")
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    # Step 1: Fetch content
-    texts = []
-    skipped = []
-    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as downloader:
-        future_to_url = {downloader.submit(extract_text_from_url, url): url for url in urls}
-        for i, future in enumerate(as_completed(future_to_url)):
-            url = future_to_url[future]
-            try:
-                data = future.result()
-                texts.append(data)
-                print(f"[{i+1}/{len(urls)}] Downloaded: {url}")
-            except Exception as e:
-                logging.error(f"Download error for {url}: {e}")
-                skipped.append(url)
-
-    # Step 2: Spell check using multiprocessing
     report = []
-    with ProcessPoolExecutor(max_workers=MAX_PROCESS_WORKERS) as processor:
-        futures = processor.map(find_spelling_errors_for_text, texts)
-        for errors in futures:
-            report.extend(errors)
+    skipped = []
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            logging.error(f"Audit error for {url}: {result}")
+            skipped.append(url)
+        else:
+            report.extend(result)
+    return report, skipped
+
+def run_spellcheck_audit():
+    # Resolve the sitemap's host while the vocabulary is compiled
+    threading.Thread(target=resolve_host, args=(SITEMAP_URL,), daemon=True).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        british_words = load_british_words()
+        lengths = save_vocabulary(british_words, tmp)
+        with ProcessPoolExecutor(max_workers=MAX_PROCESS_WORKERS, initializer=_init_worker,
+                                 initargs=(tmp, lengths, load_known_suggestions(british_words))) as processor:
+            crawl = asyncio.run(crawl_site(processor))
+    if crawl is None:
+        return
+    report, skipped = crawl
 
     # Save results
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    pd.DataFrame(report).to_csv(f"auraa_spellcheck_report_{timestamp}.csv", index=False)
-    pd.DataFrame(skipped, columns=["Skipped URLs"]).to_csv(f"skipped_urls_{timestamp}.csv", index=False)
+    with open(f"auraa_spellcheck_report_{timestamp}.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(report)
+    with open(f"skipped_urls_{timestamp}.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Skipped URLs"])
+        writer.writerows([url] for url in skipped)
 
     print(f"\n✅ Spellcheck complete. Report saved.")
 